@@ -0,0 +1,153 @@
+from typing import Dict, List, Optional
+
+# 机器类型定义：展示信息 + 默认参数 + 配方（每个加工周期的输入/输出数量）
+# legacy 类型不在组件库中展示，保留用于兼容已有数据和导入脚本
+MACHINE_TEMPLATES = [
+    {
+        "type": "machine",
+        "name": "机器",
+        "description": "处理和加工物品",
+        "color": "#91d5ff",
+        "stroke": "#40a9ff",
+        "icon": "⚙️",
+        "legacy": False,
+        "defaults": {
+            "input_capacity": 10,
+            "output_capacity": 10,
+            "processing_time": 5,
+        },
+        "recipe": {
+            "inputs": {"原料": 1},
+            "outputs": {"产品": 1},
+        },
+    },
+    {
+        "type": "source",
+        "name": "源",
+        "description": "提供原材料",
+        "color": "#ffd666",
+        "stroke": "#faad14",
+        "icon": "📥",
+        "legacy": False,
+        "defaults": {
+            "input_capacity": 10,
+            "output_capacity": 10,
+            "processing_time": 5,
+        },
+        "recipe": {
+            "inputs": {},
+            "outputs": {"原料": 1},
+        },
+    },
+    {
+        "type": "input",
+        "name": "输入",
+        "description": "旧版输入节点，提供原材料",
+        "color": "#ffd666",
+        "stroke": "#faad14",
+        "icon": "📥",
+        "legacy": True,
+        "defaults": {
+            "input_capacity": 10,
+            "output_capacity": 10,
+            "processing_time": 5,
+        },
+        "recipe": {
+            "inputs": {},
+            "outputs": {"原料": 1},
+        },
+    },
+    {
+        "type": "processor",
+        "name": "处理器",
+        "description": "旧版处理节点",
+        "color": "#91d5ff",
+        "stroke": "#40a9ff",
+        "icon": "⚙️",
+        "legacy": True,
+        "defaults": {
+            "input_capacity": 10,
+            "output_capacity": 10,
+            "processing_time": 5,
+        },
+        "recipe": {
+            "inputs": {"原料": 1},
+            "outputs": {"产品": 1},
+        },
+    },
+    {
+        "type": "output",
+        "name": "输出",
+        "description": "旧版输出节点，接收成品",
+        "color": "#b7eb8f",
+        "stroke": "#52c41a",
+        "icon": "📤",
+        "legacy": True,
+        "defaults": {
+            "input_capacity": 10,
+            "output_capacity": 10,
+            "processing_time": 5,
+        },
+        "recipe": {
+            "inputs": {"产品": 1},
+            "outputs": {},
+        },
+    },
+    {
+        "type": "storage",
+        "name": "仓库",
+        "description": "旧版存储节点",
+        "color": "#ffccc7",
+        "stroke": "#ff4d4f",
+        "icon": "📦",
+        "legacy": True,
+        "defaults": {
+            "input_capacity": 10,
+            "output_capacity": 10,
+            "processing_time": 5,
+        },
+        "recipe": {
+            "inputs": {"产品": 1},
+            "outputs": {"产品": 1},
+        },
+    },
+]
+
+
+def _build_rate_table(processing_time: float, recipe: dict) -> dict:
+    # 按默认处理时间预先计算每分钟的理论消耗/产出
+    cycles_per_minute = 60 / processing_time if processing_time > 0 else 0
+    return {
+        "cycles_per_minute": cycles_per_minute,
+        "inputs_per_minute": {item: qty * cycles_per_minute for item, qty in recipe["inputs"].items()},
+        "outputs_per_minute": {item: qty * cycles_per_minute for item, qty in recipe["outputs"].items()},
+    }
+
+
+def build_catalog() -> Dict[str, dict]:
+    catalog = {}
+    for template in MACHINE_TEMPLATES:
+        defaults = template["defaults"]
+        recipe = template["recipe"]
+        catalog[template["type"]] = {
+            **template,
+            "defaults": {
+                **defaults,
+                "input_items": list(recipe["inputs"]),
+                "output_items": list(recipe["outputs"]),
+            },
+            "rates": _build_rate_table(defaults["processing_time"], recipe),
+        }
+    return catalog
+
+
+# 目录是纯数据，导入模块时即构建完成；每个工作进程导入时各自构建一次，开销可忽略
+CATALOG: Dict[str, dict] = build_catalog()
+
+
+def get_machine_types() -> List[dict]:
+    return list(CATALOG.values())
+
+
+def get_machine_type(machine_type: str) -> Optional[dict]:
+    return CATALOG.get(machine_type)
@@ -11,6 +11,19 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# 创建数据库表（一次性预热步骤）
+def init_db():
+    with engine.connect() as connection:
+        # 先取得数据库写锁再检查和建表：多个工作进程同时启动时依次执行，
+        # 后执行的进程看到表已存在直接跳过，不会重复建表
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        Base.metadata.create_all(bind=connection)
+        # create_all 不会为已存在的表补建索引，这里逐个补建（CREATE INDEX IF NOT EXISTS）
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+        connection.commit()
+
 # 依赖注入
 def get_db():
     db = SessionLocal()
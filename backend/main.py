@@ -3,23 +3,39 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 import uvicorn
 import logging
+import os
 
-from routers import machines, production, websocket
-from database import engine, Base
+from routers import machines, production, websocket, catalog
+from database import init_db
 
 # 设置日志级别
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# 创建数据库表
-Base.metadata.create_all(bind=engine)
+# 预热标记：主进程完成建表后设置，工作进程通过继承的环境变量跳过重复建表
+# 机器类型目录在 catalog 模块导入时构建，每个工作进程各自构建一次
+WARMED_ENV = "FSIM_WARMED"
+
+def warm_up():
+    init_db()
+    os.environ[WARMED_ENV] = "1"
+
+# 直接用 uvicorn main:app 启动时没有主进程预热，在此补做；
+# 多工作进程同时补做时由 init_db 中的数据库写锁保证依次建表
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv(WARMED_ENV) != "1":
+        warm_up()
+    yield
 
 app = FastAPI(
     title="产线模拟器API",
     description="一个基于拖拽的产线模拟器后端API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 添加请求验证错误处理器
@@ -27,7 +43,8 @@ app = FastAPI(
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logger.error(f"验证错误 - URL: {request.url}")
     logger.error(f"验证错误详情: {exc.errors()}")
-    logger.error(f"请求体: {await request.body()}")
+    # 请求体已被读取过，再次 await request.body() 会一直等待，直接使用异常中保存的请求体
+    logger.error(f"请求体: {exc.body}")
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors()}
@@ -44,6 +61,7 @@ app.add_middleware(
 
 # 注册路由
 app.include_router(machines.router, prefix="/api", tags=["machines"])
+app.include_router(catalog.router, prefix="/api/catalog", tags=["catalog"])
 app.include_router(production.router, prefix="/api/production", tags=["production"])
 app.include_router(websocket.router, prefix="/ws", tags=["websocket"])
 
@@ -59,4 +77,10 @@ async def health_check():
     return {"status": "healthy"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    warm_up()
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1:
+        # 工作进程继承环境变量中的预热标记，启动时不再建表
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
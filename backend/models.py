@@ -27,8 +27,8 @@ class Connection(Base):
     __tablename__ = "connections"
     
     id = Column(Integer, primary_key=True, index=True)
-    source_machine_id = Column(Integer, ForeignKey("machines.id"))
-    target_machine_id = Column(Integer, ForeignKey("machines.id"))
+    source_machine_id = Column(Integer, ForeignKey("machines.id"), index=True)
+    target_machine_id = Column(Integer, ForeignKey("machines.id"), index=True)
     source_output_index = Column(Integer, default=0)  # 源机器输出索引
     target_input_index = Column(Integer, default=0)  # 目标机器输入索引
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -65,4 +65,10 @@ class ProductionRate(Base):
     machine_id = Column(Integer, ForeignKey("machines.id"))
     item_type = Column(String)
     rate_per_minute = Column(Float)  # 每分钟生产速率
-    calculated_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    calculated_at = Column(DateTime, default=datetime.utcnow)
+
+class LayoutVersion(Base):
+    __tablename__ = "layout_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0)  # 机器位置每次变更时递增，各工作进程据此判断空间索引是否过期
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException
+from typing import List, Dict
+from pydantic import BaseModel
+
+from catalog import get_machine_types, get_machine_type
+
+router = APIRouter()
+
+class MachineDefaults(BaseModel):
+    input_capacity: int
+    output_capacity: int
+    processing_time: float
+    input_items: List[str]
+    output_items: List[str]
+
+class MachineRecipe(BaseModel):
+    inputs: Dict[str, int]
+    outputs: Dict[str, int]
+
+class MachineRates(BaseModel):
+    cycles_per_minute: float
+    inputs_per_minute: Dict[str, float]
+    outputs_per_minute: Dict[str, float]
+
+class MachineTypeResponse(BaseModel):
+    type: str
+    name: str
+    description: str
+    color: str
+    stroke: str
+    icon: str
+    legacy: bool
+    defaults: MachineDefaults
+    recipe: MachineRecipe
+    rates: MachineRates
+
+# 机器类型目录
+@router.get("/machine-types", response_model=List[MachineTypeResponse])
+def list_machine_types():
+    return get_machine_types()
+
+@router.get("/machine-types/{machine_type}", response_model=MachineTypeResponse)
+def get_machine_type_detail(machine_type: str):
+    template = get_machine_type(machine_type)
+    if not template:
+        raise HTTPException(status_code=404, detail="Machine type not found")
+    return template
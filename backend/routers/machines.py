@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 from database import get_db
 from models import Machine, Connection, ItemType
+from spatial_index import machine_index, bump_layout_version
+from catalog import get_machine_type
 
 router = APIRouter()
 
+# 视口内机器数超过该值时不再返回机器明细，改为返回聚合后的格子
+VIEWPORT_MAX_MACHINES = 2000
+# 聚合时视口每个方向划分的格子数
+VIEWPORT_CLUSTER_DIVISIONS = 32
+
 class MachineCreate(BaseModel):
     name: str
     type: str
@@ -15,9 +22,10 @@ class MachineCreate(BaseModel):
     y: float
     input_capacity: int
     output_capacity: int
-    processing_time: float
-    input_items: List[str]
-    output_items: List[str]
+    processing_time: float = Field(gt=0)
+    # 不传时按机器类型配方填充
+    input_items: Optional[List[str]] = None
+    output_items: Optional[List[str]] = None
 
 class MachineUpdate(BaseModel):
     name: str = None
@@ -25,7 +33,7 @@ class MachineUpdate(BaseModel):
     y: float = None
     input_capacity: int = None
     output_capacity: int = None
-    processing_time: float = None
+    processing_time: float = Field(None, gt=0)
     input_items: List[str] = None
     output_items: List[str] = None
     is_active: bool = None
@@ -62,6 +70,24 @@ class ConnectionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MachineCluster(BaseModel):
+    x: float
+    y: float
+    count: int
+
+class ViewportResponse(BaseModel):
+    machines: List[MachineResponse]
+    connections: List[ConnectionResponse]
+    clusters: List[MachineCluster] = []
+    total_machines: int
+
+class MachineExtentResponse(BaseModel):
+    count: int
+    min_x: Optional[float] = None
+    min_y: Optional[float] = None
+    max_x: Optional[float] = None
+    max_y: Optional[float] = None
+
 class ItemTypeCreate(BaseModel):
     name: str
     color: str
@@ -76,15 +102,37 @@ class ItemTypeResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def _apply_recipe_items(machine: MachineCreate, template: dict):
+    # 输入/输出物品必须与配方一致，未传时使用配方默认值
+    recipe = template["recipe"]
+    for field, recipe_key in (("input_items", "inputs"), ("output_items", "outputs")):
+        expected = list(recipe[recipe_key])
+        items = getattr(machine, field)
+        if items is None:
+            setattr(machine, field, expected)
+        elif sorted(items) != sorted(expected):
+            raise HTTPException(
+                status_code=400,
+                detail=f"{field} {items} does not match recipe of {machine.type}: {expected}"
+            )
+
 # 机器相关API
 @router.post("/machines", response_model=MachineResponse)
 def create_machine(machine: MachineCreate, db: Session = Depends(get_db)):
+    # 按机器类型目录校验
+    template = get_machine_type(machine.type)
+    if not template:
+        raise HTTPException(status_code=400, detail=f"Unknown machine type: {machine.type}")
+    _apply_recipe_items(machine, template)
+
     try:
         print(f"接收到的机器数据: {machine.dict()}")
         db_machine = Machine(**machine.dict())
         db.add(db_machine)
+        version = bump_layout_version(db)
         db.commit()
         db.refresh(db_machine)
+        machine_index.upsert(db_machine.id, db_machine.x, db_machine.y, version)
         print(f"机器创建成功: {db_machine.id}")
         return db_machine
     except Exception as e:
@@ -98,6 +146,64 @@ def get_machines(db: Session = Depends(get_db)):
     machines = db.query(Machine).all()
     return machines
 
+# 以下两个接口需在 /machines/{machine_id} 之前注册
+# 机器总数及所有机器的坐标范围
+@router.get("/machines/extent", response_model=MachineExtentResponse)
+def get_machines_extent(db: Session = Depends(get_db)):
+    machine_index.sync(db)
+    extent = machine_index.extent()
+    if extent is None:
+        return MachineExtentResponse(count=0)
+    min_x, min_y, max_x, max_y = extent
+    return MachineExtentResponse(
+        count=machine_index.count(),
+        min_x=min_x,
+        min_y=min_y,
+        max_x=max_x,
+        max_y=max_y
+    )
+
+# 按视口查询机器及其连接
+@router.get("/machines/viewport", response_model=ViewportResponse)
+def get_machines_in_viewport(
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    db: Session = Depends(get_db)
+):
+    if min_x > max_x or min_y > max_y:
+        raise HTTPException(status_code=400, detail="Invalid viewport bounds")
+
+    machine_index.sync(db)
+    total_machines = machine_index.count()
+    machine_ids = machine_index.query(min_x, min_y, max_x, max_y)
+    if not machine_ids:
+        return ViewportResponse(machines=[], connections=[], total_machines=total_machines)
+
+    # 缩放到很远时只返回聚合结果，避免一次返回并渲染整张表
+    if len(machine_ids) > VIEWPORT_MAX_MACHINES:
+        clusters = machine_index.cluster(
+            machine_ids, min_x, min_y, max_x, max_y, VIEWPORT_CLUSTER_DIVISIONS
+        )
+        return ViewportResponse(
+            machines=[], connections=[], clusters=clusters, total_machines=total_machines
+        )
+
+    connections = db.query(Connection).filter(
+        Connection.source_machine_id.in_(machine_ids) |
+        Connection.target_machine_id.in_(machine_ids)
+    ).all()
+
+    # 跨越视口边界的连接需要另一端的机器才能绘制
+    related_ids = set(machine_ids)
+    for conn in connections:
+        related_ids.add(conn.source_machine_id)
+        related_ids.add(conn.target_machine_id)
+
+    machines = db.query(Machine).filter(Machine.id.in_(related_ids)).all()
+    return ViewportResponse(machines=machines, connections=connections, total_machines=total_machines)
+
 @router.get("/machines/{machine_id}", response_model=MachineResponse)
 def get_machine(machine_id: int, db: Session = Depends(get_db)):
     machine = db.query(Machine).filter(Machine.id == machine_id).first()
@@ -120,8 +226,13 @@ def update_machine(machine_id: int, machine: MachineUpdate, db: Session = Depend
     for field, value in update_data.items():
         setattr(db_machine, field, value)
     
+    moved = "x" in update_data or "y" in update_data
+    if moved:
+        version = bump_layout_version(db)
     db.commit()
     db.refresh(db_machine)
+    if moved:
+        machine_index.upsert(db_machine.id, db_machine.x, db_machine.y, version)
     
     print(f"更新后机器位置: x={db_machine.x}, y={db_machine.y}")
     return db_machine
@@ -139,7 +250,9 @@ def delete_machine(machine_id: int, db: Session = Depends(get_db)):
     ).delete()
     
     db.delete(machine)
+    version = bump_layout_version(db)
     db.commit()
+    machine_index.remove(machine_id, version)
     return {"message": "Machine deleted successfully"}
 
 @router.delete("/machines")
@@ -151,7 +264,9 @@ def delete_all_machines(db: Session = Depends(get_db)):
     deleted_count = db.query(Machine).count()
     db.query(Machine).delete()
     
+    version = bump_layout_version(db)
     db.commit()
+    machine_index.clear(version)
     return {"message": f"All {deleted_count} machines deleted successfully"}
 
 # 连接相关API
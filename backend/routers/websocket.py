@@ -1,74 +1,209 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List, Dict
+from typing import List, Dict, Optional
 import asyncio
+import itertools
 import json
+import logging
+import os
 from datetime import datetime
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import ProductionRecord, ProductionRate, Machine
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+# 溢出策略
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # 丢弃最旧的消息
+OVERFLOW_LATEST = "latest"            # 按消息类型合并，每种类型只保留最新快照
+OVERFLOW_DISCONNECT = "disconnect"    # 断开慢客户端
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_LATEST, OVERFLOW_DISCONNECT)
+
+# 每个客户端发送队列的容量与溢出策略，可通过环境变量配置
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "16"))
+WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", OVERFLOW_LATEST)
+# 断开慢客户端时等待关闭握手的最长时间（秒）
+WS_CLOSE_TIMEOUT = 1.0
+
+def _message_type(message: str) -> Optional[str]:
+    # 推送消息均为带 type 字段的JSON，用于按类型合并
+    try:
+        payload = json.loads(message)
+    except ValueError:
+        return None
+    return payload.get("type") if isinstance(payload, dict) else None
+
+class ClientConnection:
+    """单个WebSocket客户端：有界发送队列 + 独立发送任务，队列元素为 (消息类型, 消息)"""
+
+    def __init__(self, client_id: int, websocket: WebSocket, max_queue_size: int):
+        self.id = client_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.sender_task: asyncio.Task = None
+        self.sent = 0
+        self.dropped = 0
+        self.overflowed = False
+        self.connected_at = datetime.utcnow()
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, max_queue_size: int = WS_QUEUE_SIZE, overflow_policy: str = WS_OVERFLOW_POLICY):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow_policy}")
+        # asyncio.Queue(maxsize=0) 没有容量上限，会让有界队列失效
+        if max_queue_size <= 0:
+            raise ValueError(f"发送队列容量必须为正数: {max_queue_size}")
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.total_dropped = 0
+        self.total_disconnected_slow = 0
+        self._ids = itertools.count(1)
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = ClientConnection(next(self._ids), websocket, self.max_queue_size)
+        self.clients[websocket] = client
+        client.sender_task = asyncio.create_task(self._sender(client))
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        if client.sender_task is not None and client.sender_task is not asyncio.current_task():
+            client.sender_task.cancel()
+
+    def is_connected(self, websocket: WebSocket) -> bool:
+        return websocket in self.clients
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
+    async def _sender(self, client: ClientConnection):
+        # 每个客户端独立发送，慢客户端只会阻塞自己的队列
         try:
-            await websocket.send_text(message)
-        except:
-            pass
-
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                disconnected.append(connection)
-        
-        # 清理断开的连接
-        for conn in disconnected:
-            if conn in self.active_connections:
-                self.active_connections.remove(conn)
+            while True:
+                _, message = await client.queue.get()
+                await client.websocket.send_text(message)
+                client.sent += 1
+        except asyncio.CancelledError:
+            # Python 3.8 中 CancelledError 是 Exception 的子类，须先原样抛出
+            raise
+        except Exception as e:
+            logger.warning(f"WebSocket客户端 {client.id} 发送失败: {e}")
+        finally:
+            self.clients.pop(client.websocket, None)
+            # 被取消时仍需关闭溢出的连接，关闭完成后取消异常继续向上传播
+            if client.overflowed:
+                try:
+                    await asyncio.wait_for(client.websocket.close(code=1013), timeout=WS_CLOSE_TIMEOUT)
+                except Exception as e:
+                    logger.debug(f"关闭WebSocket客户端 {client.id} 失败: {e}")
+
+    def _enqueue(self, client: ClientConnection, message_type: Optional[str], message: str):
+        if not client.queue.full():
+            client.queue.put_nowait((message_type, message))
+            return
+
+        if self.overflow_policy == OVERFLOW_DISCONNECT:
+            client.overflowed = True
+            self.total_disconnected_slow += 1
+            logger.warning(f"WebSocket客户端 {client.id} 发送队列已满，断开连接")
+            self.clients.pop(client.websocket, None)
+            client.sender_task.cancel()
+            return
+
+        if self.overflow_policy == OVERFLOW_LATEST:
+            # 丢弃同类型的旧快照，其他类型的待发送消息保持不变
+            pending = []
+            while not client.queue.empty():
+                pending.append(client.queue.get_nowait())
+            kept = [item for item in pending if item[0] != message_type]
+            if len(kept) >= self.max_queue_size:
+                kept = kept[1:]
+            dropped = len(pending) - len(kept)
+            for item in kept:
+                client.queue.put_nowait(item)
+        else:
+            dropped = 1
+            client.queue.get_nowait()
+
+        client.dropped += dropped
+        self.total_dropped += dropped
+        client.queue.put_nowait((message_type, message))
+
+    async def send_personal_message(self, message: str, websocket: WebSocket, message_type: Optional[str] = None):
+        client = self.clients.get(websocket)
+        if client is not None:
+            if message_type is None:
+                message_type = _message_type(message)
+            self._enqueue(client, message_type, message)
+
+    async def broadcast(self, message: str, message_type: Optional[str] = None):
+        # 只入队不等待发送，广播耗时与最慢的客户端无关
+        if message_type is None:
+            message_type = _message_type(message)
+        for client in list(self.clients.values()):
+            self._enqueue(client, message_type, message)
+
+    def stats(self) -> dict:
+        clients = [{
+            "id": client.id,
+            "queue_depth": client.queue.qsize(),
+            "sent": client.sent,
+            "dropped": client.dropped,
+            "connected_at": client.connected_at.isoformat()
+        } for client in self.clients.values()]
+
+        return {
+            "active_connections": len(clients),
+            "max_queue_size": self.max_queue_size,
+            "overflow_policy": self.overflow_policy,
+            "max_queue_depth": max((c["queue_depth"] for c in clients), default=0),
+            "total_dropped": self.total_dropped,
+            "total_disconnected_slow": self.total_disconnected_slow,
+            "clients": clients
+        }
 
 manager = ConnectionManager()
 
+@router.get("/stats")
+def get_websocket_stats():
+    return manager.stats()
+
 @router.websocket("/ws/production")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
-        while True:
+        while manager.is_connected(websocket):
             # 每2秒推送一次实时数据
             await asyncio.sleep(2)
             
             # 获取实时生产数据
             data = await get_realtime_production_data()
-            await manager.send_personal_message(json.dumps(data), websocket)
+            await manager.send_personal_message(json.dumps(data), websocket, data["type"])
             
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 @router.websocket("/ws/rates")
 async def rates_websocket(websocket: WebSocket):
     await manager.connect(websocket)
     try:
-        while True:
+        while manager.is_connected(websocket):
             # 每5秒推送一次生产速率数据
             await asyncio.sleep(5)
             
             data = await get_production_rates_data()
-            await manager.send_personal_message(json.dumps(data), websocket)
+            await manager.send_personal_message(json.dumps(data), websocket, data["type"])
             
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 async def get_realtime_production_data():
@@ -139,8 +274,8 @@ async def get_production_rates_data():
 # 用于主动推送数据的函数
 async def broadcast_production_update():
     data = await get_realtime_production_data()
-    await manager.broadcast(json.dumps(data))
+    await manager.broadcast(json.dumps(data), data["type"])
 
 async def broadcast_rates_update():
     data = await get_production_rates_data()
-    await manager.broadcast(json.dumps(data))
\ No newline at end of file
+    await manager.broadcast(json.dumps(data), data["type"])
\ No newline at end of file
@@ -0,0 +1,180 @@
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple
+import math
+
+from sqlalchemy.orm import Session
+
+from models import Machine, LayoutVersion
+
+# 网格单元边长（画布坐标），与机器节点尺寸(160x120)同一数量级
+CELL_SIZE = 500.0
+
+# 机器节点的半宽/半高，用于判断节点是否与视口相交
+NODE_HALF_WIDTH = 80.0
+NODE_HALF_HEIGHT = 60.0
+
+LAYOUT_VERSION_ID = 1
+
+
+def read_layout_version(db: Session) -> int:
+    version = db.query(LayoutVersion.version).filter(LayoutVersion.id == LAYOUT_VERSION_ID).scalar()
+    return version or 0
+
+
+def bump_layout_version(db: Session) -> int:
+    # 必须与机器变更处于同一事务中、在提交前调用，返回变更后的版本号
+    updated = db.query(LayoutVersion).filter(LayoutVersion.id == LAYOUT_VERSION_ID).update(
+        {LayoutVersion.version: LayoutVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.add(LayoutVersion(id=LAYOUT_VERSION_ID, version=1))
+        db.flush()
+    return read_layout_version(db)
+
+
+class MachineGridIndex:
+    """基于均匀网格的机器空间索引，按画布坐标查询视口内的机器ID
+
+    索引是每个进程内的缓存，数据库中的布局版本号是唯一可信来源：
+    查询前调用 sync() 对比版本号，其他工作进程修改过机器位置时整体重建。
+    """
+
+    def __init__(self, cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+        self.positions: Dict[int, Tuple[float, float]] = {}
+        self.version: Optional[int] = None  # None 表示未加载或已失效
+        self.lock = Lock()
+
+    def _cell_of(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _insert_unlocked(self, machine_id: int, x: float, y: float):
+        x = x if x is not None else 0.0
+        y = y if y is not None else 0.0
+        self.positions[machine_id] = (x, y)
+        self.cells[self._cell_of(x, y)].add(machine_id)
+
+    def _remove_unlocked(self, machine_id: int):
+        position = self.positions.pop(machine_id, None)
+        if position is None:
+            return
+        cell = self._cell_of(*position)
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.discard(machine_id)
+            if not bucket:
+                del self.cells[cell]
+
+    def _clear_unlocked(self):
+        self.cells.clear()
+        self.positions.clear()
+
+    def sync(self, db: Session):
+        version = read_layout_version(db)
+        with self.lock:
+            if self.version == version:
+                return
+            # 持锁读取，避免读取期间其他线程的增量更新被旧数据覆盖
+            rows = db.query(Machine.id, Machine.x, Machine.y).all()
+            self._clear_unlocked()
+            for machine_id, x, y in rows:
+                self._insert_unlocked(machine_id, x, y)
+            self.version = version
+
+    def _apply(self, version: int, change):
+        # 仅当本地索引恰好落后一个版本时增量更新，否则标记失效，下次查询时重建
+        with self.lock:
+            if self.version is not None and self.version == version - 1:
+                change()
+                self.version = version
+            else:
+                self.version = None
+
+    def upsert(self, machine_id: int, x: float, y: float, version: int):
+        def change():
+            self._remove_unlocked(machine_id)
+            self._insert_unlocked(machine_id, x, y)
+        self._apply(version, change)
+
+    def remove(self, machine_id: int, version: int):
+        self._apply(version, lambda: self._remove_unlocked(machine_id))
+
+    def clear(self, version: int):
+        self._apply(version, self._clear_unlocked)
+
+    def count(self) -> int:
+        return len(self.positions)
+
+    def extent(self) -> Optional[Tuple[float, float, float, float]]:
+        with self.lock:
+            if not self.positions:
+                return None
+            xs = [x for x, _ in self.positions.values()]
+            ys = [y for _, y in self.positions.values()]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def query(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[int]:
+        # 视口按节点尺寸外扩，保证部分可见的节点也被返回
+        min_x -= NODE_HALF_WIDTH
+        max_x += NODE_HALF_WIDTH
+        min_y -= NODE_HALF_HEIGHT
+        max_y += NODE_HALF_HEIGHT
+
+        min_cell_x, min_cell_y = self._cell_of(min_x, min_y)
+        max_cell_x, max_cell_y = self._cell_of(max_x, max_y)
+
+        result = []
+        with self.lock:
+            # 视口覆盖的网格数超过已占用网格数时，直接遍历已占用网格
+            span = (max_cell_x - min_cell_x + 1) * (max_cell_y - min_cell_y + 1)
+            if span > len(self.cells):
+                candidate_cells = [
+                    cell for cell in self.cells
+                    if min_cell_x <= cell[0] <= max_cell_x and min_cell_y <= cell[1] <= max_cell_y
+                ]
+            else:
+                candidate_cells = [
+                    (cx, cy)
+                    for cx in range(min_cell_x, max_cell_x + 1)
+                    for cy in range(min_cell_y, max_cell_y + 1)
+                ]
+
+            for cell in candidate_cells:
+                for machine_id in self.cells.get(cell, ()):
+                    x, y = self.positions[machine_id]
+                    if min_x <= x <= max_x and min_y <= y <= max_y:
+                        result.append(machine_id)
+
+        return result
+
+    def cluster(self, machine_ids: List[int], min_x: float, min_y: float,
+                max_x: float, max_y: float, divisions: int) -> List[dict]:
+        # 将视口均分为 divisions x divisions 个格子，按格子汇总机器数量和质心
+        step_x = max(max_x - min_x, 1.0) / divisions
+        step_y = max(max_y - min_y, 1.0) / divisions
+
+        buckets: Dict[Tuple[int, int], List[float]] = {}
+        with self.lock:
+            for machine_id in machine_ids:
+                position = self.positions.get(machine_id)
+                if position is None:
+                    continue
+                x, y = position
+                key = (
+                    min(divisions - 1, max(0, int((x - min_x) / step_x))),
+                    min(divisions - 1, max(0, int((y - min_y) / step_y))),
+                )
+                bucket = buckets.setdefault(key, [0, 0.0, 0.0])
+                bucket[0] += 1
+                bucket[1] += x
+                bucket[2] += y
+
+        return [
+            {"x": sum_x / count, "y": sum_y / count, "count": count}
+            for count, sum_x, sum_y in buckets.values()
+        ]
+
+
+machine_index = MachineGridIndex()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 后端模块使用顶层导入（from models import ...），测试时将 backend 目录加入路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from catalog import CATALOG, get_machine_type
+from database import Base
+from routers.machines import MachineCreate, MachineUpdate, create_machine
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def machine_fields(**overrides):
+    fields = dict(name="m", type="machine", x=0, y=0, input_capacity=1, output_capacity=1,
+                  processing_time=5)
+    fields.update(overrides)
+    return fields
+
+
+def test_catalog_includes_legacy_types_with_rate_tables():
+    for machine_type in ("machine", "source", "input", "processor", "output", "storage"):
+        assert get_machine_type(machine_type) is not None
+    assert not CATALOG["machine"]["legacy"]
+    assert CATALOG["storage"]["legacy"]
+
+
+def test_rate_table_precomputed_from_recipe():
+    rates = get_machine_type("machine")["rates"]
+    assert rates["cycles_per_minute"] == 12
+    assert rates["inputs_per_minute"] == {"原料": 12}
+    assert rates["outputs_per_minute"] == {"产品": 12}
+    assert get_machine_type("source")["defaults"]["input_items"] == []
+
+
+def test_processing_time_must_be_positive_on_create_and_update():
+    with pytest.raises(ValidationError):
+        MachineCreate(**machine_fields(processing_time=0))
+    with pytest.raises(ValidationError):
+        MachineUpdate(processing_time=0)
+    assert MachineUpdate(x=1).processing_time is None
+
+
+def test_create_machine_fills_items_from_recipe(db):
+    machine = create_machine(MachineCreate(**machine_fields(type="source")), db)
+    assert machine.input_items == []
+    assert machine.output_items == ["原料"]
+
+
+def test_create_machine_rejects_items_not_matching_recipe(db):
+    with pytest.raises(HTTPException) as exc_info:
+        create_machine(MachineCreate(**machine_fields(input_items=["产品"], output_items=["产品"])), db)
+    assert exc_info.value.status_code == 400
+
+    machine = create_machine(MachineCreate(**machine_fields(input_items=["原料"], output_items=["产品"])), db)
+    assert machine.input_items == ["原料"]
@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+import pytest
+
+from routers.websocket import (
+    ConnectionManager,
+    OVERFLOW_DISCONNECT,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_LATEST,
+)
+
+
+class FakeWebSocket:
+    """可控的WebSocket：stalled 时 send_text 阻塞，模拟慢客户端"""
+
+    def __init__(self, stalled=False):
+        self.sent = []
+        self.closed_code = None
+        self.gate = asyncio.Event()
+        if not stalled:
+            self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        await self.gate.wait()
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_code = code
+
+
+def message(kind, seq):
+    return json.dumps({"type": kind, "seq": seq})
+
+
+def pending(manager, websocket):
+    return [json.loads(item[1])["seq"] for item in list(manager.clients[websocket].queue._queue)]
+
+
+async def connect_stalled(manager):
+    websocket = FakeWebSocket(stalled=True)
+    await manager.connect(websocket)
+    # 让发送任务取走第一条消息并阻塞在 send_text 上
+    await manager.broadcast(message("production_update", "in-flight"))
+    await asyncio.sleep(0)
+    return websocket
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_newest_messages():
+    manager = ConnectionManager(max_queue_size=3, overflow_policy=OVERFLOW_DROP_OLDEST)
+    websocket = await connect_stalled(manager)
+
+    for seq in range(5):
+        await manager.broadcast(message("production_update", seq))
+
+    assert pending(manager, websocket) == [2, 3, 4]
+    assert manager.stats()["total_dropped"] == 2
+    manager.disconnect(websocket)
+
+
+@pytest.mark.asyncio
+async def test_latest_coalesces_per_message_type():
+    manager = ConnectionManager(max_queue_size=2, overflow_policy=OVERFLOW_LATEST)
+    websocket = await connect_stalled(manager)
+
+    await manager.broadcast(message("rates_update", "r1"))
+    await manager.broadcast(message("production_update", "p1"))
+    await manager.broadcast(message("production_update", "p2"))
+    await manager.broadcast(message("production_update", "p3"))
+
+    # 速率快照不会被生产数据的新快照挤掉
+    assert pending(manager, websocket) == ["r1", "p3"]
+    assert manager.clients[websocket].dropped == 2
+    manager.disconnect(websocket)
+
+
+@pytest.mark.asyncio
+async def test_latest_drops_oldest_when_no_same_type_pending():
+    manager = ConnectionManager(max_queue_size=2, overflow_policy=OVERFLOW_LATEST)
+    websocket = await connect_stalled(manager)
+
+    await manager.broadcast(message("a", 1))
+    await manager.broadcast(message("b", 2))
+    await manager.broadcast(message("c", 3))
+
+    assert pending(manager, websocket) == [2, 3]
+    manager.disconnect(websocket)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_closes_slow_client_only():
+    manager = ConnectionManager(max_queue_size=1, overflow_policy=OVERFLOW_DISCONNECT)
+    healthy = FakeWebSocket()
+    await manager.connect(healthy)
+    slow = await connect_stalled(manager)
+
+    # 每次广播后让出事件循环，健康客户端能及时取走消息
+    for seq in (1, 2):
+        await manager.broadcast(message("production_update", seq))
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+    assert not manager.is_connected(slow)
+    assert slow.closed_code == 1013
+    assert manager.is_connected(healthy)
+    assert [json.loads(m)["seq"] for m in healthy.sent] == ["in-flight", 1, 2]
+    assert manager.stats()["total_disconnected_slow"] == 1
+    manager.disconnect(healthy)
+
+
+def test_rejects_unbounded_queue_and_unknown_policy():
+    with pytest.raises(ValueError):
+        ConnectionManager(max_queue_size=0)
+    with pytest.raises(ValueError):
+        ConnectionManager(overflow_policy="unknown")
+
+
+@pytest.mark.asyncio
+async def test_disconnect_ends_sender_task():
+    manager = ConnectionManager(max_queue_size=2, overflow_policy=OVERFLOW_DROP_OLDEST)
+    websocket = await connect_stalled(manager)
+    sender_task = manager.clients[websocket].sender_task
+
+    manager.disconnect(websocket)
+    with pytest.raises(asyncio.CancelledError):
+        await sender_task
+
+    assert sender_task.cancelled()
+    assert not manager.is_connected(websocket)
@@ -0,0 +1,111 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Machine
+from spatial_index import MachineGridIndex, bump_layout_version, read_layout_version
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def add_machine(db, x, y):
+    machine = Machine(name="m", type="machine", x=x, y=y, input_capacity=1, output_capacity=1,
+                      processing_time=1, input_items=[], output_items=[])
+    db.add(machine)
+    version = bump_layout_version(db)
+    db.commit()
+    return machine.id, version
+
+
+def test_query_negative_coordinates_and_cell_edges(db):
+    index = MachineGridIndex(cell_size=100)
+    ids = {
+        "origin": add_machine(db, 0, 0)[0],
+        "negative": add_machine(db, -250, -150)[0],
+        "edge": add_machine(db, 100, 100)[0],      # 恰好落在格子边界上
+        "just_below": add_machine(db, 99.9, 99.9)[0],
+        "far": add_machine(db, 10000, -10000)[0],
+    }
+    index.sync(db)
+
+    # 查询框按节点半宽(80)/半高(60)外扩
+    assert sorted(index.query(-300, -200, -200, -100)) == [ids["negative"]]
+    assert sorted(index.query(100, 100, 100, 100)) == sorted([ids["edge"], ids["just_below"]])
+    assert index.query(-1000, -1000, -900, -900) == []
+    assert sorted(index.query(-1e6, -1e6, 1e6, 1e6)) == sorted(ids.values())
+
+
+def test_upsert_moves_machine_between_cells(db):
+    index = MachineGridIndex(cell_size=100)
+    machine_id, _ = add_machine(db, 50, 50)
+    index.sync(db)
+
+    version = bump_layout_version(db)
+    db.commit()
+    index.upsert(machine_id, -550, 750, version)
+
+    assert index.query(0, 0, 100, 100) == []
+    assert index.query(-600, 700, -500, 800) == [machine_id]
+    assert index.cells.keys() == {(-6, 7)}
+    assert index.version == version
+
+
+def test_remove_and_clear(db):
+    index = MachineGridIndex(cell_size=100)
+    first, _ = add_machine(db, 0, 0)
+    second, _ = add_machine(db, 500, 500)
+    index.sync(db)
+
+    version = bump_layout_version(db)
+    db.commit()
+    index.remove(first, version)
+    assert sorted(index.query(-1e3, -1e3, 1e3, 1e3)) == [second]
+
+    version = bump_layout_version(db)
+    db.commit()
+    index.clear(version)
+    assert index.count() == 0
+    assert index.cells == {}
+
+
+def test_out_of_order_update_invalidates_and_resyncs(db):
+    index = MachineGridIndex()
+    add_machine(db, 0, 0)
+    index.sync(db)
+
+    # 另一个工作进程写入的变更：本地索引未收到增量更新
+    other_id, _ = add_machine(db, 10, 10)
+    assert other_id not in index.query(-100, -100, 100, 100)
+
+    index.sync(db)
+    assert index.version == read_layout_version(db)
+    assert other_id in index.query(-100, -100, 100, 100)
+
+    # 版本号跳跃的增量更新不会被应用，而是使索引失效
+    index.upsert(other_id, 5000, 5000, index.version + 2)
+    assert index.version is None
+    index.sync(db)
+    assert other_id in index.query(-100, -100, 100, 100)
+
+
+def test_cluster_aggregates_counts_and_centroids(db):
+    index = MachineGridIndex()
+    ids = [add_machine(db, x, y)[0] for x, y in [(0, 0), (10, 10), (900, 900)]]
+    index.sync(db)
+
+    clusters = index.cluster(ids, 0, 0, 1000, 1000, divisions=2)
+    by_count = sorted(clusters, key=lambda c: c["count"])
+    assert by_count == [
+        {"x": 900, "y": 900, "count": 1},
+        {"x": 5, "y": 5, "count": 2},
+    ]
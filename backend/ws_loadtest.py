@@ -0,0 +1,480 @@
+"""WebSocket推送负载测试
+
+在本地启动一个应用实例（使用临时数据库），打开大量订阅生产数据和生产速率推送的
+WebSocket客户端，同时由合成写入器持续写入生产记录，最后输出：
+
+- 端到端投递延迟：记录写入数据库到客户端首次收到该记录的时间
+- 推送延迟：服务端生成消息到客户端收到消息的时间
+- 漏推次数：相邻两条消息间隔（或最后一条消息到压测结束）超过推送周期1.5倍时，计为丢失的周期数
+- 服务端CPU与内存占用
+
+用法（在 backend 目录下）：
+    python ws_loadtest.py --clients 2000 --duration 60
+    python ws_loadtest.py --clients 5000 --client-procs 4 --write-rate 50
+    python ws_loadtest.py --url http://localhost:8000 --server-pid 12345
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+import websockets
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 推送路径及其周期（秒），与 routers/websocket.py 保持一致
+FEEDS = {
+    "production": ("/ws/ws/production", 2.0),
+    "rates": ("/ws/ws/rates", 5.0),
+}
+
+# 漏推判定阈值：间隔超过周期的倍数
+MISSED_INTERVAL_FACTOR = 1.5
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(values):
+    if not values:
+        return "无数据"
+    parts = [f"p{p}={percentile(values, p) * 1000:.1f}ms" for p in (50, 90, 99)]
+    parts.append(f"max={max(values) * 1000:.1f}ms")
+    return f"n={len(values)} " + " ".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# 服务端进程
+# ---------------------------------------------------------------------------
+
+def start_server(port):
+    """在临时目录中启动应用，避免污染开发数据库"""
+    workdir = tempfile.mkdtemp(prefix="fsim-loadtest-")
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    log_path = os.path.join(workdir, "server.log")
+    log_file = open(log_path, "w")
+
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--app-dir", BACKEND_DIR,
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--log-level", "warning",
+        ],
+        cwd=workdir,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+    return process, workdir, log_file
+
+
+def stop_server(process, workdir, log_file):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    log_file.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def http_request(method, url, payload=None, timeout=10):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method)
+    if data is not None:
+        request.add_header("Content-Type", "application/json")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read() or b"null")
+
+
+def wait_until_ready(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            http_request("GET", f"{base_url}/health", timeout=1)
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"服务在 {timeout} 秒内未就绪: {base_url}")
+
+
+class ResourceSampler(threading.Thread):
+    """定期采样服务端进程的CPU与内存"""
+
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu_percent = []
+        self.rss_bytes = []
+        self.stopped = threading.Event()
+
+    def _read(self):
+        # 返回 (累计CPU秒数, 常驻内存字节)
+        if psutil is not None:
+            process = psutil.Process(self.pid)
+            times = process.cpu_times()
+            return times.user + times.system, process.memory_info().rss
+
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{self.pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        ticks = os.sysconf("SC_CLK_TCK")
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+        return cpu_seconds, resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+    def run(self):
+        try:
+            last_cpu, _ = self._read()
+        except Exception as e:
+            print(f"无法采样服务端进程 {self.pid}: {e}")
+            return
+        last_time = time.time()
+
+        while not self.stopped.wait(self.interval):
+            try:
+                cpu, rss = self._read()
+            except Exception:
+                return
+            now = time.time()
+            self.cpu_percent.append((cpu - last_cpu) / (now - last_time) * 100)
+            self.rss_bytes.append(rss)
+            last_cpu, last_time = cpu, now
+
+    def stop(self):
+        self.stopped.set()
+        self.join(timeout=self.interval * 2)
+
+
+# ---------------------------------------------------------------------------
+# 合成写入器
+# ---------------------------------------------------------------------------
+
+def create_machines(base_url, count):
+    machine_ids = []
+    for i in range(count):
+        machine = http_request("POST", f"{base_url}/api/machines", {
+            "name": f"压测机器{i + 1}",
+            "type": "machine",
+            "x": (i % 20) * 200.0,
+            "y": (i // 20) * 160.0,
+            "input_capacity": 10,
+            "output_capacity": 10,
+            "processing_time": 5,
+            "input_items": ["原料"],
+            "output_items": ["产品"],
+        })
+        machine_ids.append(machine["id"])
+    return machine_ids
+
+
+async def synthetic_writer(base_url, machine_ids, write_rate, stop_event, stats):
+    """按固定速率调用模拟生产接口写入记录"""
+    loop = asyncio.get_running_loop()
+    interval = 1.0 / write_rate
+    next_at = time.perf_counter()
+    while not stop_event.is_set():
+        machine_id = random.choice(machine_ids)
+        query = urllib.parse.urlencode({"item_type": "产品", "quantity": random.randint(1, 5)})
+        url = f"{base_url}/api/production/simulate/{machine_id}?{query}"
+        try:
+            await loop.run_in_executor(None, http_request, "POST", url)
+            stats["writes"] += 1
+        except Exception:
+            stats["write_errors"] += 1
+
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            next_at = time.perf_counter()
+
+
+# ---------------------------------------------------------------------------
+# WebSocket客户端
+# ---------------------------------------------------------------------------
+
+def newest_write_time(feed, message):
+    # 消息中最新一条数据的写入时间
+    if feed == "production":
+        stamps = [item["timestamp"] for item in message.get("production_data", [])]
+    else:
+        stamps = [item["calculated_at"] for item in message.get("rates", [])]
+    if not stamps:
+        return None
+    return datetime.fromisoformat(max(stamps))
+
+
+async def run_client(feed, ws_url, period, deadline, connect_semaphore, result):
+    try:
+        async with connect_semaphore:
+            websocket = await websockets.connect(ws_url, open_timeout=30, max_size=None)
+    except Exception:
+        result["connect_errors"] += 1
+        return
+
+    result["connected"] += 1
+    connected_time = time.time()
+    # 按各自的连接时间计算应收到的推送数，连接越晚应收越少
+    result["expected"] += int(max(0.0, deadline - connected_time) / period)
+    last_received = None
+    last_newest = None
+    try:
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                raw = await asyncio.wait_for(websocket.recv(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+
+            received_at = datetime.utcnow()
+            received_time = time.time()
+            result["messages"] += 1
+
+            # 格式异常的消息计为错误，不中断该客户端
+            try:
+                message = json.loads(raw)
+                push_latency = (received_at - datetime.fromisoformat(message["timestamp"])).total_seconds()
+                newest = newest_write_time(feed, message)
+            except (ValueError, KeyError, TypeError):
+                result["errors"] += 1
+                continue
+
+            result["push"].append(push_latency)
+            if newest is not None and (last_newest is None or newest > last_newest):
+                # 首条消息中的记录可能在连接前已写入，不计入投递延迟
+                if last_newest is not None:
+                    result["delivery"].append((received_at - newest).total_seconds())
+                last_newest = newest
+
+            if last_received is not None:
+                gap = received_time - last_received
+                if gap > period * MISSED_INTERVAL_FACTOR:
+                    result["missed"] += max(1, round(gap / period) - 1)
+            last_received = received_time
+    except websockets.ConnectionClosed:
+        result["dropped_connections"] += 1
+    except Exception:
+        # 单个客户端的异常（如 recv 时的 OSError）不能中断整个压测
+        result["errors"] += 1
+
+    # 收到最后一条消息（或连接建立）之后一直没有推送，同样计为漏推
+    tail = deadline - (last_received or connected_time)
+    if tail > period * MISSED_INTERVAL_FACTOR:
+        result["missed"] += int(tail / period)
+
+    try:
+        await websocket.close()
+    except Exception:
+        pass
+
+
+def empty_result():
+    return {
+        "connected": 0,
+        "connect_errors": 0,
+        "dropped_connections": 0,
+        "errors": 0,
+        "failed_clients": 0,
+        "messages": 0,
+        "expected": 0,
+        "missed": 0,
+        "push": [],
+        "delivery": [],
+    }
+
+
+async def run_clients(ws_base_url, client_counts, duration, connect_concurrency):
+    results = {feed: empty_result() for feed in FEEDS}
+    semaphore = asyncio.Semaphore(connect_concurrency)
+    deadline = time.time() + duration
+
+    tasks = []
+    for feed, count in client_counts.items():
+        path, period = FEEDS[feed]
+        for _ in range(count):
+            tasks.append(run_client(feed, ws_base_url + path, period, deadline, semaphore, results[feed]))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def merge_results(target, source):
+    for feed, result in source.items():
+        for key, value in result.items():
+            target[feed][key] += value
+
+
+def split_evenly(total, parts):
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+
+async def run_client_processes(ws_base_url, client_counts, duration, connect_concurrency, procs):
+    """将客户端分散到多个子进程，突破单进程事件循环的上限"""
+    shares = {feed: split_evenly(count, procs) for feed, count in client_counts.items()}
+    processes = []
+    for i in range(procs):
+        processes.append(await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--worker",
+            "--ws-url", ws_base_url,
+            "--production-clients", str(shares["production"][i]),
+            "--rates-clients", str(shares["rates"][i]),
+            "--duration", str(duration),
+            "--connect-concurrency", str(max(1, connect_concurrency // procs)),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        ))
+
+    results = {feed: empty_result() for feed in FEEDS}
+    for i, process in enumerate(processes):
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            # 子进程异常退出时没有可用的结果，报告其错误输出并将其客户端计为失败
+            print(f"客户端子进程 {i} 异常退出 (返回码 {process.returncode}):\n"
+                  f"{stderr.decode(errors='replace').strip()}", file=sys.stderr)
+            for feed in FEEDS:
+                results[feed]["failed_clients"] += shares[feed][i]
+            continue
+        merge_results(results, json.loads(stdout))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# 入口
+# ---------------------------------------------------------------------------
+
+def report(results, duration, writer_stats, sampler, server_stats):
+    print()
+    print("=" * 60)
+    print(f"压测时长: {duration}s  写入: {writer_stats['writes']} 条 (失败 {writer_stats['write_errors']})")
+    for feed, result in results.items():
+        path, period = FEEDS[feed]
+        print(f"\n[{feed}] {path} (周期 {period}s)")
+        print(f"  连接成功: {result['connected']}  连接失败: {result['connect_errors']}  "
+              f"中途断开: {result['dropped_connections']}  客户端错误: {result['errors']}  "
+              f"子进程失败: {result['failed_clients']}")
+        print(f"  收到消息: {result['messages']} / 预期约 {result['expected']}  漏推周期: {result['missed']}")
+        print(f"  推送延迟: {summarize(result['push'])}")
+        print(f"  投递延迟: {summarize(result['delivery'])}")
+
+    if sampler is not None and sampler.cpu_percent:
+        print("\n[服务端资源]")
+        print(f"  CPU: 平均 {sum(sampler.cpu_percent) / len(sampler.cpu_percent):.1f}%  "
+              f"峰值 {max(sampler.cpu_percent):.1f}%")
+        print(f"  内存: 峰值 {max(sampler.rss_bytes) / 1024 / 1024:.1f}MB  "
+              f"结束时 {sampler.rss_bytes[-1] / 1024 / 1024:.1f}MB")
+
+    if server_stats is not None:
+        print("\n[发送队列]")
+        print(f"  策略: {server_stats['overflow_policy']}  容量: {server_stats['max_queue_size']}  "
+              f"丢弃消息: {server_stats['total_dropped']}  断开慢客户端: {server_stats['total_disconnected_slow']}")
+    print("=" * 60)
+
+
+async def run(args):
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+        server_pid = args.server_pid
+    else:
+        server = start_server(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+        server_pid = server[0].pid
+
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, wait_until_ready, base_url)
+        machine_ids = await loop.run_in_executor(None, create_machines, base_url, args.machines)
+        print(f"服务已就绪: {base_url}，已创建 {len(machine_ids)} 台机器")
+
+        sampler = ResourceSampler(server_pid) if server_pid else None
+        if sampler is not None:
+            sampler.start()
+
+        production_clients = int(args.clients * args.production_share)
+        client_counts = {"production": production_clients, "rates": args.clients - production_clients}
+        print(f"打开 {args.clients} 个客户端 (production={client_counts['production']}, "
+              f"rates={client_counts['rates']})，子进程数 {args.client_procs}，持续 {args.duration}s")
+
+        writer_stats = {"writes": 0, "write_errors": 0}
+        stop_event = asyncio.Event()
+        writer = asyncio.create_task(synthetic_writer(base_url, machine_ids, args.write_rate, stop_event, writer_stats))
+
+        ws_base_url = "ws" + base_url[len("http"):]
+        if args.client_procs > 1:
+            results = await run_client_processes(
+                ws_base_url, client_counts, args.duration, args.connect_concurrency, args.client_procs)
+        else:
+            results = await run_clients(ws_base_url, client_counts, args.duration, args.connect_concurrency)
+
+        stop_event.set()
+        await writer
+        if sampler is not None:
+            sampler.stop()
+
+        try:
+            server_stats = await loop.run_in_executor(None, http_request, "GET", f"{base_url}/ws/stats")
+        except Exception:
+            server_stats = None
+
+        report(results, args.duration, writer_stats, sampler, server_stats)
+    finally:
+        if server is not None:
+            stop_server(*server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket推送负载测试")
+    parser.add_argument("--clients", type=int, default=1000, help="WebSocket客户端总数")
+    parser.add_argument("--production-share", type=float, default=0.5, help="订阅生产数据推送的客户端比例，其余订阅生产速率")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长（秒）")
+    parser.add_argument("--machines", type=int, default=20, help="写入器使用的机器数量")
+    parser.add_argument("--write-rate", type=float, default=10, help="每秒写入的生产记录数")
+    parser.add_argument("--client-procs", type=int, default=1, help="客户端子进程数，1表示在当前进程内运行")
+    parser.add_argument("--connect-concurrency", type=int, default=200, help="同时进行握手的连接数上限")
+    parser.add_argument("--port", type=int, default=8765, help="本地启动服务使用的端口")
+    parser.add_argument("--url", help="压测已运行的服务而不是本地启动，例如 http://localhost:8000")
+    parser.add_argument("--server-pid", type=int, help="配合 --url 使用，用于采样服务端CPU与内存")
+    # 子进程模式参数
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--ws-url", help=argparse.SUPPRESS)
+    parser.add_argument("--production-clients", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--rates-clients", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        client_counts = {"production": args.production_clients, "rates": args.rates_clients}
+        results = asyncio.run(run_clients(args.ws_url, client_counts, args.duration, args.connect_concurrency))
+        json.dump(results, sys.stdout)
+        return
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
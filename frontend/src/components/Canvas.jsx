@@ -5,17 +5,41 @@ import { Graph } from '@antv/g6';
 import { DndProvider } from 'react-dnd';
 import { HTML5Backend } from 'react-dnd-html5-backend';
 import MachinePalette from './MachinePalette';
-import { machineAPI, connectionAPI } from '../services/api';
+import { machineAPI, catalogAPI } from '../services/api';
+
+// 视口外扩比例：预取可见区域周围的机器，平移时减少请求
+const VIEWPORT_PREFETCH_RATIO = 0.5;
+// 平移/缩放结束后延迟加载的时间（毫秒）
+const VIEWPORT_FETCH_DELAY = 150;
+// 聚合节点：缩放过远时后端只返回按格子汇总的机器数量
+const CLUSTER_ID_PREFIX = 'cluster-';
+// 与后端 VIEWPORT_CLUSTER_DIVISIONS 保持一致
+const CLUSTER_DIVISIONS = 32;
+// 自动适配视图时的边距（像素）
+const FIT_VIEW_PADDING = 50;
+
+const isClusterNode = (nodeId) => String(nodeId).startsWith(CLUSTER_ID_PREFIX);
 
 const Canvas = () => {
   const containerRef = useRef(null);
   const graphRef = useRef(null);
-  const [machines, setMachines] = useState([]);
-  const [connections, setConnections] = useState([]);
+  const loadedBoundsRef = useRef(null);
+  const viewportTimerRef = useRef(null);
+  // 当前是否显示聚合节点；聚合模式下缩放后需要重新请求明细
+  const clusterModeRef = useRef(false);
+  // 机器类型目录，按类型索引；图表回调中使用，因此放在ref中
+  const catalogRef = useRef({});
+  // 视口请求序号，只处理最近一次请求的响应
+  const fetchSeqRef = useRef(0);
+  // 全部机器数量（图表中只包含当前视口加载的机器）
+  const [totalMachines, setTotalMachines] = useState(0);
+  // 机器类型目录列表，只请求一次并传给组件库
+  const [machineTypes, setMachineTypes] = useState([]);
 
   useEffect(() => {
     // 延迟初始化，确保DOM完全渲染
-    const timer = setTimeout(() => {
+    const timer = setTimeout(async () => {
+      await fetchCatalog();
       initializeGraph();
       fetchData();
     }, 100);
@@ -38,6 +62,7 @@ const Canvas = () => {
 
     return () => {
       clearTimeout(timer);
+      clearTimeout(viewportTimerRef.current);
       window.removeEventListener('resize', handleResize);
       if (graphRef.current && !graphRef.current.destroyed) {
         graphRef.current.destroy();
@@ -46,31 +71,114 @@ const Canvas = () => {
     };
   }, []);
 
+  const fetchCatalog = async () => {
+    try {
+      const response = await catalogAPI.getMachineTypes();
+      catalogRef.current = Object.fromEntries(response.data.map(template => [template.type, template]));
+      setMachineTypes(response.data);
+    } catch (error) {
+      console.error('获取机器类型目录失败:', error);
+    }
+  };
+
+  // 按目录中的默认参数生成新机器；目录获取失败时按类型回退到内置默认值
+  const buildNewMachine = (machineType, name, x, y) => {
+    const template = catalogRef.current[machineType];
+    const defaults = template?.defaults || {
+      input_capacity: 10,
+      output_capacity: 10,
+      processing_time: 5,
+      input_items: machineType === 'source' ? [] : ['原料'],
+      output_items: machineType === 'source' ? ['原料'] : ['产品'],
+    };
+    return { ...defaults, name, type: machineType, x, y };
+  };
+
+  // 计算当前可见区域的画布坐标范围
+  const getVisibleBounds = () => {
+    const graph = graphRef.current;
+    if (!graph || graph.destroyed || !containerRef.current) {
+      return null;
+    }
+
+    const width = containerRef.current.clientWidth || 800;
+    const height = containerRef.current.clientHeight || 600;
+    const [x1, y1] = graph.getCanvasByViewport([0, 0]);
+    const [x2, y2] = graph.getCanvasByViewport([width, height]);
+
+    return {
+      minX: Math.min(x1, x2),
+      minY: Math.min(y1, y2),
+      maxX: Math.max(x1, x2),
+      maxY: Math.max(y1, y2),
+    };
+  };
+
+  const isInsideLoadedBounds = (bounds) => {
+    const loaded = loadedBoundsRef.current;
+    return !!loaded &&
+      bounds.minX >= loaded.minX && bounds.minY >= loaded.minY &&
+      bounds.maxX <= loaded.maxX && bounds.maxY <= loaded.maxY;
+  };
+
   const fetchData = async () => {
+    const visible = getVisibleBounds();
+    if (!visible) {
+      console.warn('图表引用不存在，无法获取视口数据');
+      return;
+    }
+
+    // 在可见区域外预留一圈，小幅平移时无需重新请求
+    const padX = (visible.maxX - visible.minX) * VIEWPORT_PREFETCH_RATIO;
+    const padY = (visible.maxY - visible.minY) * VIEWPORT_PREFETCH_RATIO;
+    const bounds = {
+      minX: visible.minX - padX,
+      minY: visible.minY - padY,
+      maxX: visible.maxX + padX,
+      maxY: visible.maxY + padY,
+    };
+
+    const seq = ++fetchSeqRef.current;
     try {
-      console.log('开始获取机器和连接数据...');
-      const [machinesRes, connectionsRes] = await Promise.all([
-        machineAPI.getAll(),
-        connectionAPI.getAll()
-      ]);
-      
-      console.log('获取到的机器数据:', machinesRes.data);
-      console.log('获取到的连接数据:', connectionsRes.data);
-      
-      setMachines(machinesRes.data);
-      setConnections(connectionsRes.data);
-      
-      if (graphRef.current) {
-        console.log('开始更新图表数据...');
-        updateGraphData(machinesRes.data, connectionsRes.data);
+      console.log('开始获取视口内的机器和连接数据...', bounds);
+      const response = await machineAPI.getViewport(bounds);
+      if (seq !== fetchSeqRef.current) {
+        // 已有更新的视口请求，丢弃过期响应
+        return;
+      }
+      const {
+        machines: viewMachines,
+        connections: viewConnections,
+        clusters,
+        total_machines: total,
+      } = response.data;
+
+      console.log('视口内机器数量:', viewMachines.length, '连接数量:', viewConnections.length, '聚合格子数量:', clusters.length);
+
+      loadedBoundsRef.current = bounds;
+      setTotalMachines(total);
+      clusterModeRef.current = clusters.length > 0;
+      if (clusterModeRef.current) {
+        updateClusterData(clusters, bounds);
       } else {
-        console.warn('图表引用不存在，无法更新数据');
+        updateGraphData(viewMachines, viewConnections);
       }
     } catch (error) {
       console.error('获取数据失败:', error);
     }
   };
 
+  // 平移/缩放结束后，超出已加载范围时才重新请求
+  const scheduleViewportFetch = () => {
+    clearTimeout(viewportTimerRef.current);
+    viewportTimerRef.current = setTimeout(() => {
+      const visible = getVisibleBounds();
+      if (visible && (clusterModeRef.current || !isInsideLoadedBounds(visible))) {
+        fetchData();
+      }
+    }, VIEWPORT_FETCH_DELAY);
+  };
+
   const initializeGraph = () => {
     if (!containerRef.current) return;
     
@@ -125,7 +233,7 @@ const Canvas = () => {
           },
           getItems: (e) => {
             console.log('G6获取右键菜单项:', e);
-            if (e.targetType === 'node') {
+            if (e.targetType === 'node' && !isClusterNode(e.itemId || e.target?.id)) {
               // 保存当前右键的节点ID到全局变量
               window.currentContextMenuNodeId = e.itemId || e.target?.id;
               console.log('保存右键节点ID:', window.currentContextMenuNodeId);
@@ -182,6 +290,9 @@ const Canvas = () => {
       }
       
       const nodeId = target.id;
+      if (isClusterNode(nodeId)) {
+        return;
+      }
       console.log(`拖拽结束，节点ID: ${nodeId}`);
       
       // 尝试多种方式获取拖拽后的位置
@@ -247,6 +358,9 @@ const Canvas = () => {
       }
     });
 
+    // 视口变化时按需加载机器
+    graph.on('aftertransform', scheduleViewportFetch);
+
     // G6 v5 连线功能暂时禁用，后续实现
     // graph.on('aftercreateedge', async (e) => {
     //   // 连线逻辑
@@ -271,16 +385,11 @@ const Canvas = () => {
 
     console.log('正在处理机器数据，机器数量:', machines.length);
     
+    // 节点数量可能很大，逐个节点的日志会拖慢平移和缩放，这里不再输出
     const nodes = machines.map(machine => {
-      console.log(`=== 处理机器 ${machine.id} ===`);
-      console.log('原始机器数据:', machine);
-      console.log('机器坐标:', { x: machine.x, y: machine.y, type: typeof machine.x, typeY: typeof machine.y });
-      
       const finalX = machine.x !== undefined && machine.x !== null ? machine.x : 200;
       const finalY = machine.y !== undefined && machine.y !== null ? machine.y : 150;
       
-      console.log('最终节点坐标:', { x: finalX, y: finalY });
-      
       const node = {
         id: machine.id.toString(),
         type: 'rect',
@@ -312,7 +421,6 @@ const Canvas = () => {
         
       };
       
-      console.log(`机器 ${machine.id} (${machine.name}) 最终节点:`, node);
       return node;
     });
 
@@ -323,7 +431,6 @@ const Canvas = () => {
     }));
 
     console.log('准备设置图表数据 - 节点数量:', nodes.length, '边数量:', edges.length);
-    console.log('节点数据:', nodes);
 
     try {
       if (graphRef.current && !graphRef.current.destroyed) {
@@ -358,7 +465,45 @@ const Canvas = () => {
     }
   };
 
+  // 渲染聚合节点，节点尺寸随视口范围缩放，保证缩放后在屏幕上大小合适
+  const updateClusterData = (clusters, bounds) => {
+    if (!graphRef.current || graphRef.current.destroyed) {
+      console.warn('图表已销毁或不存在，无法更新数据');
+      return;
+    }
+
+    const step = (bounds.maxX - bounds.minX) / CLUSTER_DIVISIONS;
+    const maxCount = Math.max(...clusters.map(cluster => cluster.count));
+
+    const nodes = clusters.map((cluster, index) => ({
+      id: `${CLUSTER_ID_PREFIX}${index}`,
+      type: 'circle',
+      style: {
+        x: cluster.x,
+        y: cluster.y,
+        size: step * (0.3 + 0.6 * Math.sqrt(cluster.count / maxCount)),
+        fill: '#91d5ff',
+        stroke: '#40a9ff',
+        lineWidth: step * 0.02,
+        labelText: String(cluster.count),
+        labelPlacement: 'center',
+        labelFontSize: step * 0.2,
+        labelFill: '#000',
+      },
+    }));
+
+    try {
+      graphRef.current.setData({ nodes, edges: [] });
+      graphRef.current.render();
+    } catch (error) {
+      console.error('更新聚合数据失败:', error);
+    }
+  };
+
   const getMachineColor = (type) => {
+    if (catalogRef.current[type]) {
+      return catalogRef.current[type].color;
+    }
     const colors = {
       'machine': '#91d5ff',
       'source': '#ffd666',
@@ -372,6 +517,9 @@ const Canvas = () => {
   };
 
   const getMachineStroke = (type) => {
+    if (catalogRef.current[type]) {
+      return catalogRef.current[type].stroke;
+    }
     const strokes = {
       'machine': '#40a9ff',
       'source': '#faad14',
@@ -385,6 +533,9 @@ const Canvas = () => {
   };
 
   const getMachineIcon = (type) => {
+    if (catalogRef.current[type]) {
+      return catalogRef.current[type].icon;
+    }
     const icons = {
       'machine': '⚙️',
       'source': '📥',
@@ -417,9 +568,12 @@ const Canvas = () => {
     console.log('容器边界信息:', { left: rect.left, top: rect.top, width: rect.width, height: rect.height });
     console.log('计算的容器相对坐标:', { x: clientX, y: clientY });
     
-    // 直接使用容器相对坐标
+    // 容器相对坐标需换算为画布坐标，画布平移或缩放后两者不再一致
     let canvasX = clientX;
     let canvasY = clientY;
+    if (graphRef.current && !graphRef.current.destroyed) {
+      [canvasX, canvasY] = graphRef.current.getCanvasByViewport([clientX, clientY]);
+    }
     
     // 确保坐标是有效数字，但保持0值
     canvasX = isNaN(Number(canvasX)) ? 0 : Number(canvasX);
@@ -428,22 +582,13 @@ const Canvas = () => {
     console.log('最终将使用的坐标:', { x: canvasX, y: canvasY });
     
     // 验证坐标是否合理
-    if (canvasX < 0 || canvasY < 0 || canvasX > rect.width || canvasY > rect.height) {
-      console.warn('坐标超出容器范围:', { x: canvasX, y: canvasY, containerSize: { width: rect.width, height: rect.height } });
+    if (clientX < 0 || clientY < 0 || clientX > rect.width || clientY > rect.height) {
+      console.warn('坐标超出容器范围:', { x: clientX, y: clientY, containerSize: { width: rect.width, height: rect.height } });
     }
 
     try {
-      const newMachine = {
-        name: `新${machineType === 'machine' ? '机器' : '源'}${machines.length + 1}`,
-        type: machineType,
-        x: canvasX,
-        y: canvasY,
-        input_capacity: 10,
-        output_capacity: 10,
-        processing_time: 5,
-        input_items: machineType === 'source' ? [] : ['原料'],
-        output_items: machineType === 'source' ? ['原料'] : ['产品'],
-      };
+      const typeName = catalogRef.current[machineType]?.name || machineType;
+      const newMachine = buildNewMachine(machineType, `新${typeName}${totalMachines + 1}`, canvasX, canvasY);
 
       console.log('发送的机器数据:', JSON.stringify(newMachine, null, 2));
 
@@ -472,17 +617,12 @@ const Canvas = () => {
 
   const handleAddMachine = async (machineType) => {
     try {
-      const newMachine = {
-        name: `新机器${machines.length + 1}`,
-        type: machineType,
-        x: 300 + Math.random() * 200,
-        y: 200 + Math.random() * 200,
-        input_capacity: 10,
-        output_capacity: 10,
-        processing_time: 5,
-        input_items: ['原料'],
-        output_items: ['产品'],
-      };
+      const newMachine = buildNewMachine(
+        machineType,
+        `新机器${totalMachines + 1}`,
+        300 + Math.random() * 200,
+        200 + Math.random() * 200,
+      );
 
       const response = await machineAPI.create(newMachine);
       await fetchData();
@@ -522,13 +662,23 @@ const Canvas = () => {
   };
 
   const handleDeleteAllMachines = async () => {
-    if (window.confirm(`确定要删除所有 ${machines.length} 台机器吗？此操作不可撤销。`)) {
+    // 从服务端获取全部机器数量，视口内加载的机器只是其中一部分
+    let count;
+    try {
+      const response = await machineAPI.getExtent();
+      count = response.data.count;
+    } catch (error) {
+      console.error('获取机器总数失败:', error);
+      return;
+    }
+
+    if (window.confirm(`确定要删除所有 ${count} 台机器吗？此操作不可撤销。`)) {
       try {
         await machineAPI.deleteAll();
         
-        // 清空本地状态
-        setMachines([]);
-        setConnections([]);
+        // 清空本地状态，并作废删除前发出的视口请求
+        fetchSeqRef.current += 1;
+        setTotalMachines(0);
         
         // 清空图表
         if (graphRef.current && !graphRef.current.destroyed) {
@@ -544,26 +694,35 @@ const Canvas = () => {
     }
   };
 
-  const handleFitView = () => {
-    if (!graphRef.current || graphRef.current.destroyed) {
+  const handleFitView = async () => {
+    const graph = graphRef.current;
+    if (!graph || graph.destroyed) {
       console.warn('图表不存在，无法调整视图');
       return;
     }
 
     try {
-      if (machines.length > 0) {
-        // 如果有机器，适配所有机器
-        graphRef.current.fitView({
-          padding: [50, 50, 50, 50], // 上右下左边距
-          rules: {
-            direction: 'both', // 水平和垂直方向都适配
-            ratioRule: 'min', // 使用最小比例
-          }
-        });
+      // 画布上只加载了视口内的机器，需按服务端返回的全部机器范围计算缩放和平移
+      const { data: extent } = await machineAPI.getExtent();
+      if (extent.count > 0) {
+        const width = containerRef.current.clientWidth || 800;
+        const height = containerRef.current.clientHeight || 600;
+        // 范围按节点尺寸(160x120)外扩
+        const extentWidth = extent.max_x - extent.min_x + 160;
+        const extentHeight = extent.max_y - extent.min_y + 120;
+        const zoom = Math.min(
+          (width - 2 * FIT_VIEW_PADDING) / extentWidth,
+          (height - 2 * FIT_VIEW_PADDING) / extentHeight,
+        );
+        await graph.zoomTo(zoom, false);
+
+        const center = [(extent.min_x + extent.max_x) / 2, (extent.min_y + extent.max_y) / 2];
+        const [screenX, screenY] = graph.getViewportByCanvas(center);
+        await graph.translateBy([width / 2 - screenX, height / 2 - screenY], false);
         console.log('视图已适配所有机器');
       } else {
         // 如果没有机器，重置到中心
-        graphRef.current.fitCenter();
+        await graph.fitCenter();
         console.log('视图已重置到中心');
       }
     } catch (error) {
@@ -575,7 +734,7 @@ const Canvas = () => {
     <DndProvider backend={HTML5Backend}>
       <Row gutter={16} style={{ height: '100%', margin: 0 }}>
         <Col span={4}>
-          <MachinePalette onAddMachine={handleAddMachine} />
+          <MachinePalette machineTypes={machineTypes} onAddMachine={handleAddMachine} />
         </Col>
         <Col span={20}>
           <Card 
@@ -600,7 +759,7 @@ const Canvas = () => {
                   onClick={handleDeleteAllMachines}
                   size="small"
                 >
-                  清空所有机器 ({machines.length})
+                  清空所有机器 ({totalMachines})
                 </Button>
               </Space>
             }
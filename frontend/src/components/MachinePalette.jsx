@@ -7,23 +7,22 @@ import {
 
 const { Title } = Typography;
 
-const MachinePalette = ({ onAddMachine }) => {
-  const machineTypes = [
-    {
-      type: 'machine',
-      name: '机器',
-      icon: <SettingOutlined />,
-      description: '处理和加工物品',
-      color: '#91d5ff',
-    },
-    {
-      type: 'source',
-      name: '源',
-      icon: <ImportOutlined />,
-      description: '提供原材料',
-      color: '#ffd666',
-    },
-  ];
+// 图标属于前端展示，其余信息来自后端机器类型目录
+const typeIcons = {
+  'machine': <SettingOutlined />,
+  'source': <ImportOutlined />,
+};
+
+// 目录尚未获取或获取失败时使用的内置类型
+const fallbackMachineTypes = [
+  { type: 'machine', name: '机器', color: '#91d5ff', icon: '⚙️' },
+  { type: 'source', name: '源', color: '#ffd666', icon: '📥' },
+];
+
+const MachinePalette = ({ machineTypes = [], onAddMachine }) => {
+  // 旧版类型仅用于兼容已有数据，不在组件库中展示
+  const catalogTypes = machineTypes.filter((template) => !template.legacy);
+  const paletteTypes = catalogTypes.length > 0 ? catalogTypes : fallbackMachineTypes;
 
   const handleDragStart = (e, machineType) => {
     e.dataTransfer.setData('machineType', machineType);
@@ -33,7 +32,7 @@ const MachinePalette = ({ onAddMachine }) => {
   return (
     <Card title="组件库" size="small" style={{ height: '100%' }}>
       <div style={{ display: 'flex', flexDirection: 'column', gap: '16px' }}>
-        {machineTypes.map((machine) => (
+        {paletteTypes.map((machine) => (
           <div
             key={machine.type}
             draggable
@@ -66,7 +65,7 @@ const MachinePalette = ({ onAddMachine }) => {
             }}
           >
             <div style={{ fontSize: '32px', color: '#000', marginBottom: '8px' }}>
-              {machine.icon}
+              {typeIcons[machine.type] || machine.icon}
             </div>
             <div style={{ fontSize: '14px', fontWeight: 'bold', color: '#000' }}>
               {machine.name}
@@ -12,6 +12,9 @@ const api = axios.create({
 export const machineAPI = {
   getAll: () => api.get('/machines'),
   getById: (id) => api.get(`/machines/${id}`),
+  getExtent: () => api.get('/machines/extent'),
+  getViewport: ({ minX, minY, maxX, maxY }) =>
+    api.get('/machines/viewport', { params: { min_x: minX, min_y: minY, max_x: maxX, max_y: maxY } }),
   create: (data) => api.post('/machines', data),
   update: (id, data) => api.put(`/machines/${id}`, data),
   delete: (id) => api.delete(`/machines/${id}`),
@@ -25,6 +28,12 @@ export const connectionAPI = {
   delete: (id) => api.delete(`/connections/${id}`),
 };
 
+// 机器类型目录API
+export const catalogAPI = {
+  getMachineTypes: () => api.get('/catalog/machine-types'),
+  getMachineType: (type) => api.get(`/catalog/machine-types/${type}`),
+};
+
 // 物品类型相关API
 export const itemTypeAPI = {
   getAll: () => api.get('/machines/item-types'),